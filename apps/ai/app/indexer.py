@@ -19,7 +19,16 @@ class ImageIndexer:
         self.metadata_path = INDEX_DIR / f"{dataset_id}_metadata.json"
         self.clip_model = create_clip_model()
         self.index = None
-        self.metadata = []
+        self._set_metadata([])
+
+    def _set_metadata(self, metadata: List[Dict]):
+        """Store patch metadata plus column arrays used to format search hits."""
+        self.metadata = metadata
+        # One fancy-index + tolist() per column instead of a dict lookup per hit
+        self._boxes = np.array(
+            [[m["x"], m["y"], m["width"], m["height"]] for m in metadata]
+        ).reshape(-1, 4)
+        self._levels = np.array([m.get("level", 2) for m in metadata])
 
     def build_index(
         self,
@@ -69,7 +78,7 @@ class ImageIndexer:
         dimension = embeddings_array.shape[1]
         self.index = faiss.IndexFlatL2(dimension)  # Simple L2 index for demo
         self.index.add(embeddings_array)
-        self.metadata = metadata
+        self._set_metadata(metadata)
 
         # Save index and metadata
         faiss.write_index(self.index, str(self.index_path))
@@ -85,7 +94,7 @@ class ImageIndexer:
 
         self.index = faiss.read_index(str(self.index_path))
         with open(self.metadata_path, "r") as f:
-            self.metadata = json.load(f)
+            self._set_metadata(json.load(f))
 
     def search(self, query: str, top_k: int = 20) -> List[Dict]:
         """Search for patches matching the query."""
@@ -104,25 +113,23 @@ class ImageIndexer:
         # Search
         distances, indices = self.index.search(query_embedding, top_k)
 
-        # Format results
-        results = []
-        for dist, idx in zip(distances[0], indices[0]):
-            if idx >= 0 and idx < len(self.metadata):
-                meta = self.metadata[idx]
-                results.append(
-                    {
-                        "bbox": {
-                            "x": meta["x"],
-                            "y": meta["y"],
-                            "width": meta["width"],
-                            "height": meta["height"],
-                        },
-                        "score": float(1.0 / (1.0 + dist)),  # Convert distance to similarity
-                        "metadata": {"level": meta.get("level", 2)},
-                    }
-                )
-
-        return results
+        # Format results; FAISS pads missing hits with -1
+        indices = indices[0]
+        valid = (indices >= 0) & (indices < len(self.metadata))
+        hits = indices[valid]
+        # Convert distance to similarity
+        scores = 1.0 / (1.0 + distances[0][valid].astype(np.float64))
+
+        return [
+            {
+                "bbox": {"x": x, "y": y, "width": width, "height": height},
+                "score": score,
+                "metadata": {"level": level},
+            }
+            for (x, y, width, height), score, level in zip(
+                self._boxes[hits].tolist(), scores.tolist(), self._levels[hits].tolist()
+            )
+        ]
 
 
 def build_index_for_dataset(dataset_id: str):
@@ -2,6 +2,7 @@
 
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
@@ -46,6 +47,8 @@ app = FastAPI(
     description="Backend API for deep zoom image viewing with AI search",
     version="0.1.0",
     lifespan=lifespan,
+    # orjson encodes the JSON bodies (dataset lists, search hits) several times faster
+    default_response_class=ORJSONResponse,
 )
 
 # Add rate limiter
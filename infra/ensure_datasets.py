@@ -4,14 +4,18 @@ Ensure default datasets (Andromeda, Earth, Sun, Hockey) are present.
 
 - Checks for downloaded originals in infra/downloads/
 - Checks for DZI tiles in infra/tiles/{dataset}/
-- Generates missing pieces by invoking existing processors
+- Generates missing pieces by running the existing processors in-process,
+  in parallel; downloads overlap, while tiling (which already uses every
+  core) runs one dataset at a time
 
 Usage:
-    python infra/ensure_datasets.py
+    python infra/ensure_datasets.py [--jobs N]
 """
-import sys
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import subprocess
+from typing import Callable, List, Optional, Set
 
 REPO_ROOT = Path(__file__).parent.parent
 INFRA_DIR = REPO_ROOT / "infra"
@@ -27,45 +31,93 @@ SUN_DZI = TILES / "sun" / "info.dzi"
 HOCKEY_JPG = DOWNLOADS / "hockey_original.jpg"
 HOCKEY_DZI = TILES / "hockey" / "info.dzi"
 
+DEFAULT_JOBS = 3
 
-def ensure_andromeda() -> None:
-    need_download = not ANDROMEDA_JPG.exists()
-    need_tiles = not ANDROMEDA_DZI.exists()
+
+# Processors are imported lazily so a fully-provisioned checkout does not pay
+# for importing PIL/requests/tqdm just to print "present".
+def run_andromeda() -> None:
+    from process_real_image import main as process_andromeda
+    process_andromeda([])
+
+
+def run_earth() -> None:
+    from process_earth_image import main as process_earth
+    process_earth()
+
+
+def run_sun() -> None:
+    from process_sun_image import main as process_sun
+    process_sun()
+
+
+def ensure_andromeda(downloads: Set[str], tiles: Set[str]) -> Optional[Callable[[], None]]:
+    need_download = ANDROMEDA_JPG.name not in downloads
+    need_tiles = "andromeda" not in tiles or not ANDROMEDA_DZI.exists()
     if need_download or need_tiles:
         print("Ensuring Andromeda dataset (this may take time)...")
-        subprocess.run([sys.executable, str(INFRA_DIR / "process_real_image.py")], check=True)
-    else:
-        print("✓ Andromeda present")
+        return run_andromeda
+    print("✓ Andromeda present")
+    return None
 
 
-def ensure_earth() -> None:
-    need_download = not EARTH_JPG.exists()
-    need_tiles = not EARTH_DZI.exists()
+def ensure_earth(downloads: Set[str], tiles: Set[str]) -> Optional[Callable[[], None]]:
+    need_download = EARTH_JPG.name not in downloads
+    need_tiles = "earth" not in tiles or not EARTH_DZI.exists()
     if need_download or need_tiles:
         print("Ensuring Earth dataset (this may take time)...")
-        subprocess.run([sys.executable, str(INFRA_DIR / "process_earth_image.py")], check=True)
-    else:
-        print("✓ Earth present")
+        return run_earth
+    print("✓ Earth present")
+    return None
 
 
-def ensure_sun() -> None:
-    need_download = not SUN_JPG.exists()
-    need_tiles = not SUN_DZI.exists()
+def ensure_sun(downloads: Set[str], tiles: Set[str]) -> Optional[Callable[[], None]]:
+    need_download = SUN_JPG.name not in downloads
+    need_tiles = "sun" not in tiles or not SUN_DZI.exists()
     if need_download or need_tiles:
         print("Ensuring Sun dataset (this may take time)...")
-        subprocess.run([sys.executable, str(INFRA_DIR / "process_sun_image.py")], check=True)
-    else:
-        print("✓ Sun present")
+        return run_sun
+    print("✓ Sun present")
+    return None
+
+
+def scan_names(directory: Path, dirs: bool) -> Set[str]:
+    """Return entry names in directory with a single readdir (dirs or files)."""
+    with os.scandir(directory) as it:
+        return {e.name for e in it if (e.is_dir() if dirs else e.is_file())}
 
 
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Ensure default datasets are present")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=DEFAULT_JOBS,
+        help=f"Number of datasets to process concurrently (default: {DEFAULT_JOBS})",
+    )
+    args = parser.parse_args(argv)
 
-def main() -> None:
     DOWNLOADS.mkdir(parents=True, exist_ok=True)
     TILES.mkdir(parents=True, exist_ok=True)
 
-    ensure_andromeda()
-    ensure_earth()
-    ensure_sun()
+    downloads = scan_names(DOWNLOADS, dirs=False)
+    tiles = scan_names(TILES, dirs=True)
+
+    pending = [
+        fn
+        for fn in (
+            ensure_andromeda(downloads, tiles),
+            ensure_earth(downloads, tiles),
+            ensure_sun(downloads, tiles),
+        )
+        if fn is not None
+    ]
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+            futures = [executor.submit(fn) for fn in pending]
+            # result() re-raises any failure (including the processors' sys.exit)
+            for future in futures:
+                future.result()
     print("✓ Default datasets ensured")
 
 
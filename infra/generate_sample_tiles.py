@@ -4,83 +4,186 @@ Generate sample tile images for the Andromeda dataset.
 Creates a simple gradient/star field pattern for demo purposes.
 """
 
+import io
 import os
+import sqlite3
 from pathlib import Path
-from PIL import Image, ImageDraw
-import random
+import numpy as np
+from PIL import Image
 
 TILES_DIR = Path(__file__).parent / "tiles" / "andromeda"
 TILE_SIZE = 256
+MAX_LEVEL = 2
+STAR_SIZES = np.array([1, 1, 1, 2])
+# Fast encoder settings: 4:2:0 chroma, single-pass Huffman, baseline scan
+JPEG_OPTIONS = {"quality": 85, "subsampling": 2, "optimize": False, "progressive": False}
+MBTILES_BATCH = 512
+MBTILES_INSERT = (
+    "INSERT INTO tiles (zoom_level, tile_column, tile_row, tile_data) VALUES (?, ?, ?, ?)"
+)
+
+# One Generator per process; creating a fresh BitGenerator per tile is wasteful
+_RNG = None
+
+
+def seed_rng(seed=None):
+    """(Re)initialize the module-level random generator."""
+    global _RNG
+    _RNG = np.random.default_rng(seed)
+    return _RNG
+
+
+def _get_rng():
+    """Return the module-level random generator, creating it on first use."""
+    return _RNG if _RNG is not None else seed_rng()
+
 
 def create_star_field_tile(width=256, height=256, star_count=20):
     """Create a tile with a gradient and stars."""
-    # Create base image with dark gradient
-    img = Image.new("RGB", (width, height), (0, 0, 0))
-    draw = ImageDraw.Draw(img)
+    rng = _get_rng()
     
-    # Add subtle gradient
-    for y in range(height):
-        brightness = int(5 + (y / height) * 20)
-        for x in range(width):
-            r = brightness + random.randint(-5, 5)
-            g = brightness + random.randint(-5, 5)
-            b = brightness + random.randint(0, 10)
-            draw.point((x, y), fill=(max(0, r), max(0, g), max(0, b)))
+    # Add subtle gradient (per-row brightness plus per-channel noise)
+    brightness = (5 + np.arange(height) / height * 20).astype(np.int16)[:, None]
+    arr = np.empty((height, width, 3), dtype=np.int16)
+    arr[..., 0] = brightness + rng.integers(-5, 6, (height, width))
+    arr[..., 1] = brightness + rng.integers(-5, 6, (height, width))
+    arr[..., 2] = brightness + rng.integers(0, 11, (height, width))
+    pixels = np.maximum(arr, 0).astype(np.uint8)
     
-    # Add random stars
-    for _ in range(star_count):
-        x = random.randint(0, width - 1)
-        y = random.randint(0, height - 1)
-        brightness = random.randint(150, 255)
-        size = random.choice([1, 1, 1, 2])
-        
-        for dx in range(-size, size + 1):
-            for dy in range(-size, size + 1):
-                if 0 <= x + dx < width and 0 <= y + dy < height:
-                    draw.point((x + dx, y + dy), fill=(brightness, brightness, brightness))
+    # Add random stars, scattering each size group's square kernel at once
+    xs = rng.integers(0, width, star_count)
+    ys = rng.integers(0, height, star_count)
+    star_brightness = rng.integers(150, 256, star_count).astype(np.uint8)
+    sizes = rng.choice(STAR_SIZES, star_count)
     
-    return img
+    for size in np.unique(sizes):
+        selected = sizes == size
+        offsets = np.arange(-size, size + 1)
+        dy, dx = np.meshgrid(offsets, offsets, indexing="ij")
+        py = ys[selected, None] + dy.ravel()
+        px = xs[selected, None] + dx.ravel()
+        inside = (py >= 0) & (py < height) & (px >= 0) & (px < width)
+        values = np.broadcast_to(star_brightness[selected, None], py.shape)
+        pixels[py[inside], px[inside]] = values[inside][:, None]
+    
+    return Image.fromarray(pixels)
 
-def generate_tiles():
-    """Generate tiles for levels 0-2."""
-    print("Generating sample tiles for Andromeda dataset...")
+def create_base_image(tiles_per_side: int) -> Image.Image:
+    """Synthesize the full-resolution level once as a grid of star-field blocks."""
+    size = tiles_per_side * TILE_SIZE
+    base = Image.new("RGB", (size, size), (0, 0, 0))
+    rng = _get_rng()
+    
+    for col in range(tiles_per_side):
+        for row in range(tiles_per_side):
+            # Add some variation based on position
+            star_count = int(rng.integers(20, 41))
+            if col in [1, 2] and row in [1, 2]:  # Center area brighter
+                star_count += 20
+            
+            block = create_star_field_tile(TILE_SIZE, TILE_SIZE, star_count=star_count)
+            base.paste(block, (col * TILE_SIZE, row * TILE_SIZE))
     
-    # Level 0: Single tile (full image at lowest resolution)
-    level_0_dir = TILES_DIR / "0"
-    level_0_dir.mkdir(parents=True, exist_ok=True)
+    return base
+
+def open_mbtiles(path: Path) -> sqlite3.Connection:
+    """Create (or replace) an MBTiles file and return an open connection."""
+    if path.exists():
+        path.unlink()
+    path.parent.mkdir(parents=True, exist_ok=True)
     
-    tile = create_star_field_tile(256, 256, star_count=30)
-    tile.save(level_0_dir / "0_0.jpg", "JPEG", quality=85)
-    print(f"Created level 0: 1 tile")
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute("CREATE TABLE metadata (name TEXT, value TEXT)")
+    db.execute(
+        "CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, "
+        "tile_row INTEGER, tile_data BLOB)"
+    )
+    db.execute("CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)")
+    db.executemany(
+        "INSERT INTO metadata (name, value) VALUES (?, ?)",
+        [
+            ("name", "andromeda-sample"),
+            ("format", "jpg"),
+            ("minzoom", "0"),
+            ("maxzoom", str(MAX_LEVEL)),
+        ],
+    )
+    return db
+
+def generate_tiles(seed=None, mbtiles_path=None):
+    """Generate tiles for levels 0-2.
     
-    # Level 1: 2x2 tiles
-    level_1_dir = TILES_DIR / "1"
-    level_1_dir.mkdir(parents=True, exist_ok=True)
+    The highest level is synthesized once; each lower level is a 2x box
+    downscale of the one above, so overviews match the detail tiles.
+    Pass a seed for a reproducible star field. When mbtiles_path is given,
+    tiles go into that single SQLite file instead of one JPEG per tile.
+    """
+    print("Generating sample tiles for Andromeda dataset...")
+    seed_rng(seed)
     
-    for col in range(2):
-        for row in range(2):
-            tile = create_star_field_tile(256, 256, star_count=25)
-            tile.save(level_1_dir / f"{col}_{row}.jpg", "JPEG", quality=85)
-    print(f"Created level 1: 4 tiles")
+    db = open_mbtiles(mbtiles_path) if mbtiles_path else None
+    pending = []
     
-    # Level 2: 4x4 tiles
-    level_2_dir = TILES_DIR / "2"
-    level_2_dir.mkdir(parents=True, exist_ok=True)
+    level_img = create_base_image(2 ** MAX_LEVEL)
+    total_tiles = 0
     
-    for col in range(4):
-        for row in range(4):
-            # Add some variation based on position
-            star_count = random.randint(20, 40)
-            if col in [1, 2] and row in [1, 2]:  # Center area brighter
-                star_count += 20
-            
-            tile = create_star_field_tile(256, 256, star_count=star_count)
-            tile.save(level_2_dir / f"{col}_{row}.jpg", "JPEG", quality=85)
-    print(f"Created level 2: 16 tiles")
+    for level in range(MAX_LEVEL, -1, -1):
+        level_dir = TILES_DIR / str(level)
+        if db is None:
+            level_dir.mkdir(parents=True, exist_ok=True)
+        
+        tiles_per_side = 2 ** level
+        for col in range(tiles_per_side):
+            for row in range(tiles_per_side):
+                box = (
+                    col * TILE_SIZE,
+                    row * TILE_SIZE,
+                    (col + 1) * TILE_SIZE,
+                    (row + 1) * TILE_SIZE,
+                )
+                tile = level_img.crop(box)
+                if db is None:
+                    tile.save(level_dir / f"{col}_{row}.jpg", "JPEG", **JPEG_OPTIONS)
+                    continue
+                
+                buf = io.BytesIO()
+                tile.save(buf, "JPEG", **JPEG_OPTIONS)
+                # MBTiles rows are TMS-ordered (origin at the bottom)
+                pending.append((level, col, tiles_per_side - 1 - row, buf.getvalue()))
+                if len(pending) >= MBTILES_BATCH:
+                    db.executemany(MBTILES_INSERT, pending)
+                    pending.clear()
+        
+        count = tiles_per_side * tiles_per_side
+        total_tiles += count
+        print(f"Created level {level}: {count} tile{'s' if count != 1 else ''}")
+        
+        if level > 0:
+            level_img = level_img.reduce(2)
+    
+    if db is not None:
+        db.executemany(MBTILES_INSERT, pending)
+        db.commit()
+        db.close()
+        print(f"\nTotal: {total_tiles} tiles written to {mbtiles_path}")
+        return
     
-    print(f"\nTotal: 21 tiles generated in {TILES_DIR}")
+    print(f"\nTotal: {total_tiles} tiles generated in {TILES_DIR}")
     print("DZI descriptor already exists at:", TILES_DIR / "info.dzi")
 
 if __name__ == "__main__":
-    generate_tiles()
-
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Generate sample Andromeda tiles")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible tiles")
+    parser.add_argument(
+        "--mbtiles",
+        type=Path,
+        default=None,
+        help="Write tiles into a single MBTiles file instead of a directory tree",
+    )
+    args = parser.parse_args()
+    
+    generate_tiles(seed=args.seed, mbtiles_path=args.mbtiles)
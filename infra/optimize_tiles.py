@@ -10,9 +10,14 @@ This script provides:
 """
 
 import json
+import os
+import xml.etree.ElementTree as ET
+import shutil
+import subprocess
 import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
 try:
     from PIL import Image
@@ -20,8 +25,84 @@ except ImportError:
     print("Error: Pillow not installed. Run: pip install pillow")
     sys.exit(1)
 
+# Optional: precompress the preload manifest
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Optional codec plugins; importing them registers AVIF/JXL writers with Pillow
+try:
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+try:
+    import pillow_jxl  # noqa: F401
+except ImportError:
+    pass
+
 
 TILES_DIR = Path(__file__).parent / "tiles" / "andromeda"
+TILE_BATCH_SIZE = 64  # Tiles converted per worker task
+SCAN_WORKERS = 8  # Threads used to stat pyramid levels
+# Memoized analyze_tiles() output; kept outside the served tiles tree
+STATS_CACHE_PATH = Path(__file__).parent / ".cache" / f"{TILES_DIR.name}_stats.json"
+
+# Output format -> (Pillow format, encoder binary, extra Pillow save options)
+MODERN_FORMATS = {
+    "webp": ("WEBP", "cwebp", {}),
+    "avif": ("AVIF", None, {"speed": 6}),
+    "jxl": ("JXL", "cjxl", {}),
+}
+# Typical output/JPEG size ratio at quality 85, used for --dry-run projections
+ESTIMATED_SIZE_RATIO = {"webp": 0.7, "avif": 0.55, "jxl": 0.8}
+
+
+def _scan_level(level_dir: Path) -> Tuple[int, int, int, Dict[str, int]]:
+    """Return (level, tile count, total bytes, per-extension counts) for one level."""
+    # DirEntry reuses the readdir data, avoiding a Path + stat per tile
+    with os.scandir(level_dir) as it:
+        tiles = [e for e in it if e.is_file() and "." in e.name]
+    level_size = sum(e.stat().st_size for e in tiles)
+    
+    ext_counts: Dict[str, int] = {}
+    for tile in tiles:
+        ext = tile.name.rsplit(".", 1)[-1]
+        ext_counts[ext] = ext_counts.get(ext, 0) + 1
+    
+    return int(level_dir.name), len(tiles), level_size, ext_counts
+
+
+def _load_stats_cache(key: List) -> Optional[Dict]:
+    """Return cached analyze_tiles() stats if they were computed for key."""
+    try:
+        with open(STATS_CACHE_PATH) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    if cached.get("key") != key:
+        return None
+    
+    stats = cached["stats"]
+    # JSON object keys are strings; levels are ints everywhere else
+    stats["levels"] = {int(level): info for level, info in stats["levels"].items()}
+    return stats
+
+
+def _save_stats_cache(key: List, stats: Dict) -> None:
+    """Persist stats for _load_stats_cache (best effort)."""
+    try:
+        STATS_CACHE_PATH.parent.mkdir(exist_ok=True)
+        with open(STATS_CACHE_PATH, 'w') as f:
+            json.dump({"key": key, "stats": stats}, f)
+    except OSError:
+        pass
+
+
+def invalidate_stats_cache() -> None:
+    """Drop the memoized stats after tiles were added or rewritten."""
+    STATS_CACHE_PATH.unlink(missing_ok=True)
 
 
 def analyze_tiles() -> Dict:
@@ -39,88 +120,213 @@ def analyze_tiles() -> Dict:
         "formats": {},
     }
     
-    for level_dir in sorted(TILES_DIR.iterdir()):
-        if not level_dir.is_dir():
-            continue
-        
-        try:
-            level = int(level_dir.name)
-        except ValueError:
-            continue
-        
-        tiles = list(level_dir.glob("*.*"))
-        level_size = sum(t.stat().st_size for t in tiles)
-        
+    level_dirs = [
+        d for d in sorted(TILES_DIR.iterdir())
+        if d.is_dir() and d.name.isdigit()
+    ]
+    
+    # Any tile added or removed bumps its level directory's mtime; the tiles
+    # dir itself is left out since preload.json and friends are written there
+    cache_key = [[d.name, d.stat().st_mtime_ns] for d in level_dirs]
+    cached = _load_stats_cache(cache_key)
+    if cached is not None:
+        return cached
+    
+    # Levels are scanned concurrently; stat() releases the GIL
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as executor:
+        results = list(executor.map(_scan_level, level_dirs))
+    
+    for level, tile_count, level_size, ext_counts in results:
         stats["levels"][level] = {
-            "tiles": len(tiles),
+            "tiles": tile_count,
             "size_mb": level_size / 1024 / 1024
         }
-        stats["total_tiles"] += len(tiles)
+        stats["total_tiles"] += tile_count
         stats["total_size_mb"] += level_size / 1024 / 1024
         
-        for tile in tiles:
-            ext = tile.suffix[1:]
-            stats["formats"][ext] = stats["formats"].get(ext, 0) + 1
+        for ext, count in ext_counts.items():
+            stats["formats"][ext] = stats["formats"].get(ext, 0) + count
     
+    _save_stats_cache(cache_key, stats)
     return stats
 
 
-def generate_webp_tiles(quality: int = 85, skip_existing: bool = True):
+def _encoder_command(fmt: str, encoder: str, quality: int, method: int,
+                     src: Path, dst: Path) -> List[str]:
+    """Build the command line for a standalone encoder binary."""
+    if fmt == "webp":
+        return [encoder, "-q", str(quality), "-m", str(method), "-quiet", str(src), "-o", str(dst)]
+    # cjxl recompresses JPEG input losslessly (~20% smaller, no generation loss)
+    return [encoder, "--quiet", str(src), str(dst)]
+
+
+def _convert_tile_batch(
+    pairs: List[Tuple[Path, Path, int]], fmt: str, quality: int, method: int,
+    encoder: Optional[str]
+) -> List[Tuple[Path, int, int, Optional[str]]]:
+    """Worker: convert a batch of (jpg, out, jpg size) to fmt, returning sizes or errors."""
+    pil_format, _, save_options = MODERN_FORMATS[fmt]
+    if fmt == "webp":
+        save_options = {"method": method}
+    
+    results = []
+    for jpg_tile, out_tile, jpg_size in pairs:
+        try:
+            if encoder:
+                subprocess.run(
+                    _encoder_command(fmt, encoder, quality, method, jpg_tile, out_tile),
+                    check=True,
+                )
+            else:
+                with Image.open(jpg_tile) as img:
+                    img.save(out_tile, pil_format, quality=quality, **save_options)
+            
+            results.append((jpg_tile, jpg_size, out_tile.stat().st_size, None))
+        except Exception as e:
+            results.append((jpg_tile, 0, 0, str(e)))
+    return results
+
+
+def _pillow_can_save(pil_format: str) -> bool:
+    """Whether Pillow (including any registered plugins) can write pil_format."""
+    Image.init()
+    return pil_format in Image.SAVE
+
+
+def _pending_tiles(level_dir: Path, fmt: str, skip_existing: bool) -> List[Tuple[Path, Path, int]]:
+    """List (jpg, out, jpg size) for one level from a single scandir pass."""
+    with os.scandir(level_dir) as it:
+        entries = [e for e in it if e.is_file()]
+    names = {e.name for e in entries}
+    
+    pending = []
+    for entry in entries:
+        stem, dot, ext = entry.name.rpartition(".")
+        if not dot or ext != "jpg":
+            continue
+        if skip_existing and f"{stem}.{fmt}" in names:
+            continue
+        jpg_tile = level_dir / entry.name
+        pending.append((jpg_tile, jpg_tile.with_suffix(f".{fmt}"), entry.stat().st_size))
+    return pending
+
+
+def _level_dirs() -> List[Tuple[int, Path]]:
+    """Return (level, directory) pairs for the numeric level dirs, in order."""
+    levels = []
+    for level_dir in TILES_DIR.iterdir():
+        if level_dir.is_dir() and level_dir.name.isdigit():
+            levels.append((int(level_dir.name), level_dir))
+    return sorted(levels)
+
+
+def estimate_format_savings(fmt: str, skip_existing: bool = True):
     """
-    Generate WebP versions of tiles for modern browsers.
+    Project the savings of converting tiles to fmt without encoding anything.
     
-    WebP provides 25-35% better compression than JPEG with same quality.
+    Only directory entries and their sizes are read, so this is instant even
+    on pyramids where the real conversion takes minutes.
+    """
+    ratio = ESTIMATED_SIZE_RATIO[fmt]
+    label = MODERN_FORMATS[fmt][0] if fmt != "webp" else "WebP"
+    print(f"\nDry run: projecting {label} savings (~{(1 - ratio) * 100:.0f}% per tile)...")
+    
+    total_tiles = 0
+    total_jpg = 0
+    for level, level_dir in _level_dirs():
+        pending = _pending_tiles(level_dir, fmt, skip_existing)
+        if not pending:
+            continue
+        level_jpg = sum(size for _, _, size in pending)
+        total_tiles += len(pending)
+        total_jpg += level_jpg
+        print(f"  Level {level:2d}: {len(pending):6d} tiles, "
+              f"{level_jpg / 1024 / 1024:8.2f}MB -> ~{level_jpg * ratio / 1024 / 1024:8.2f}MB")
+    
+    saved_mb = total_jpg * (1 - ratio) / 1024 / 1024
+    print(f"\nWould convert {total_tiles} tiles, saving ~{saved_mb:.2f}MB")
+    print("Re-run without --dry-run to convert")
+
+
+def generate_format_tiles(fmt: str, quality: int = 85, skip_existing: bool = True,
+                          method: int = 6, workers: Optional[int] = None):
     """
-    print("\nGenerating WebP tiles for modern browsers...")
-    print(f"Quality: {quality}")
+    Generate fmt ("webp", "avif" or "jxl") versions of the JPEG tiles.
+    
+    Tiles are converted in batches across a process pool, using the
+    format's encoder binary when it is on PATH and Pillow otherwise.
+    """
+    pil_format, encoder_name, _ = MODERN_FORMATS[fmt]
+    encoder = shutil.which(encoder_name) if encoder_name else None
+    label = pil_format if fmt != "webp" else "WebP"
+    
+    print(f"\nGenerating {label} tiles for modern browsers...")
+    if not encoder and not _pillow_can_save(pil_format):
+        print(f"Skipping {label}: install {encoder_name or 'pillow-avif-plugin'} "
+              f"or a Pillow plugin that can write {pil_format}")
+        return
+    effort = f", method: {method}" if fmt == "webp" else ""
+    print(f"Quality: {quality}{effort} ({encoder_name if encoder else 'Pillow'})")
     
     total_converted = 0
     total_saved_mb = 0.0
     
-    for level_dir in sorted(TILES_DIR.iterdir()):
-        if not level_dir.is_dir():
-            continue
-        
-        try:
-            level = int(level_dir.name)
-        except ValueError:
-            continue
-        
-        jpg_tiles = list(level_dir.glob("*.jpg"))
-        if not jpg_tiles:
-            continue
-        
-        print(f"\nLevel {level}: Processing {len(jpg_tiles)} tiles...")
-        
-        for jpg_tile in jpg_tiles:
-            webp_tile = jpg_tile.with_suffix('.webp')
-            
-            if skip_existing and webp_tile.exists():
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        for level, level_dir in _level_dirs():
+            pairs = _pending_tiles(level_dir, fmt, skip_existing)
+            if not pairs:
                 continue
             
-            try:
-                with Image.open(jpg_tile) as img:
-                    img.save(webp_tile, 'WEBP', quality=quality, method=6)
-                
-                jpg_size = jpg_tile.stat().st_size
-                webp_size = webp_tile.stat().st_size
-                saved = (jpg_size - webp_size) / 1024 / 1024
-                
-                total_converted += 1
-                total_saved_mb += saved
-                
-            except Exception as e:
-                print(f"Error converting {jpg_tile}: {e}")
-    
-    print(f"\n✓ Converted {total_converted} tiles to WebP")
+            print(f"\nLevel {level}: Processing {len(pairs)} tiles...")
+            
+            batches = [pairs[i:i + TILE_BATCH_SIZE] for i in range(0, len(pairs), TILE_BATCH_SIZE)]
+            futures = [
+                executor.submit(_convert_tile_batch, batch, fmt, quality, method, encoder)
+                for batch in batches
+            ]
+            
+            for future in futures:
+                for jpg_tile, jpg_size, out_size, error in future.result():
+                    if error:
+                        print(f"Error converting {jpg_tile}: {error}")
+                        continue
+                    total_converted += 1
+                    total_saved_mb += (jpg_size - out_size) / 1024 / 1024
+    
+    invalidate_stats_cache()
+    print(f"\n✓ Converted {total_converted} tiles to {label}")
     print(f"✓ Saved {total_saved_mb:.2f}MB ({total_saved_mb / stats.get('total_size_mb', 1) * 100:.1f}% reduction)")
 
 
+def generate_webp_tiles(quality: int = 85, skip_existing: bool = True, method: int = 6,
+                        workers: Optional[int] = None):
+    """
+    Generate WebP versions of tiles for modern browsers.
+    
+    WebP provides 25-35% better compression than JPEG with same quality.
+    Lower methods trade a little size for speed (method 4 is ~3x faster than 6).
+    """
+    generate_format_tiles("webp", quality, skip_existing, method, workers)
+
+
+def _dzi_tile_size(default: int = 256) -> int:
+    """Read TileSize from the dataset's info.dzi, falling back to default."""
+    try:
+        root = ET.parse(TILES_DIR / "info.dzi").getroot()
+        return int(root.attrib.get("TileSize", default))
+    except (OSError, ET.ParseError, ValueError):
+        return default
+
+
 def generate_preload_manifest(output_path: Path = TILES_DIR / "preload.json"):
     """
     Generate a manifest of critical tiles to preload.
     
     Preloading level 0-2 can significantly improve initial load time.
+    Tiles are listed as compact [level, col, row] triples (version 2);
+    clients derive URLs as {level}/{col}_{row}.{format} and priority from
+    the level (level 0 high, others medium). Written as compact JSON, plus
+    a Brotli-compressed .br copy when the brotli package is installed.
     """
     print("\nGenerating preload manifest...")
     
@@ -132,25 +338,36 @@ def generate_preload_manifest(output_path: Path = TILES_DIR / "preload.json"):
         if not level_dir.exists():
             continue
         
-        for tile in sorted(level_dir.glob("*.jpg")):
-            relative_path = str(tile.relative_to(TILES_DIR))
-            preload_tiles.append({
-                "level": level,
-                "path": relative_path,
-                "priority": "high" if level == 0 else "medium"
-            })
+        level_tiles = []
+        with os.scandir(level_dir) as it:
+            for entry in it:
+                stem, dot, ext = entry.name.partition(".")
+                col, sep, row = stem.partition("_")
+                if ext == "jpg" and sep and col.isdigit() and row.isdigit():
+                    level_tiles.append([level, int(col), int(row)])
+        
+        preload_tiles.extend(sorted(level_tiles))
     
     manifest = {
-        "version": 1,
-        "preload": preload_tiles,
-        "total": len(preload_tiles)
+        "version": 2,
+        "tileSize": _dzi_tile_size(),
+        "format": "jpg",
+        "tiles": preload_tiles,
     }
     
-    with open(output_path, 'w') as f:
-        json.dump(manifest, f, indent=2)
+    data = json.dumps(manifest, separators=(',', ':')).encode()
+    output_path.write_bytes(data)
     
     print(f"✓ Created preload manifest with {len(preload_tiles)} tiles")
     print(f"  Saved to: {output_path}")
+    
+    # Precompressed sibling for nginx `brotli_static on`
+    br_path = output_path.with_name(output_path.name + ".br")
+    if brotli is not None:
+        br_path.write_bytes(brotli.compress(data, quality=11))
+        print(f"  Saved to: {br_path}")
+    else:
+        br_path.unlink(missing_ok=True)  # never leave a stale .br behind
 
 
 def generate_cache_headers():
@@ -167,16 +384,33 @@ location /tiles/ {
     expires 1y;
     add_header Cache-Control "public, immutable";
     
-    # Serve WebP to supporting browsers
-    location ~ \\.jpg$ {
+    # Serve precompressed preload.json.br (requires ngx_brotli)
+    brotli_static on;
+    
+    # Serve AVIF/JPEG XL/WebP siblings (0_0.avif next to 0_0.jpg) to
+    # supporting browsers; mime.types needs "image/avif avif;" and
+    # "image/jxl jxl;" on older nginx
+    location ~ ^(?<tile>.+)\\.jpg$ {
+        # add_header here replaces the outer ones, so repeat Cache-Control
+        add_header Cache-Control "public, immutable";
         add_header Vary Accept;
-        try_files $uri$webp_suffix $uri =404;
+        try_files $tile$avif_ext $tile$jxl_ext $tile$webp_ext $uri =404;
     }
 }
 
-map $http_accept $webp_suffix {
+map $http_accept $avif_ext {
+    default "";
+    "~*image/avif" ".avif";
+}
+
+map $http_accept $jxl_ext {
+    default "";
+    "~*image/jxl" ".jxl";
+}
+
+map $http_accept $webp_ext {
     default "";
-    "~*webp" ".webp";
+    "~*image/webp" ".webp";
 }
 
 Apache (.htaccess):
@@ -185,6 +419,8 @@ Apache (.htaccess):
     ExpiresActive On
     ExpiresByType image/jpeg "access plus 1 year"
     ExpiresByType image/webp "access plus 1 year"
+    ExpiresByType image/avif "access plus 1 year"
+    ExpiresByType image/jxl "access plus 1 year"
 </IfModule>
 
 <IfModule mod_headers.c>
@@ -259,14 +495,20 @@ def main():
     parser = argparse.ArgumentParser(description="Optimize tile pyramid")
     parser.add_argument("--analyze", action="store_true", help="Analyze current tiles")
     parser.add_argument("--webp", action="store_true", help="Generate WebP versions")
+    parser.add_argument("--avif", action="store_true", help="Generate AVIF versions")
+    parser.add_argument("--jxl", action="store_true", help="Generate JPEG XL versions")
     parser.add_argument("--preload", action="store_true", help="Generate preload manifest")
-    parser.add_argument("--quality", type=int, default=85, help="WebP quality (default: 85)")
+    parser.add_argument("--quality", type=int, default=85, help="WebP/AVIF quality (default: 85)")
+    parser.add_argument("--method", type=int, default=6, choices=range(7), metavar="0-6",
+                        help="WebP effort, higher is smaller but slower (default: 6)")
     parser.add_argument("--all", action="store_true", help="Run all optimizations")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Project WebP/AVIF/JXL savings from file sizes without converting")
     
     args = parser.parse_args()
     
     # Default to analysis if no args provided
-    if not any([args.analyze, args.webp, args.preload, args.all]):
+    if not any([args.analyze, args.webp, args.avif, args.jxl, args.preload, args.all]):
         args.analyze = True
     
     print("=" * 60)
@@ -280,13 +522,26 @@ def main():
     if args.all or args.analyze:
         print_optimization_summary(stats)
     
+    if args.dry_run:
+        formats = [fmt for fmt, wanted in (("webp", args.all or args.webp),
+                                           ("avif", args.avif), ("jxl", args.jxl)) if wanted]
+        for fmt in formats or ["webp"]:
+            estimate_format_savings(fmt)
+        return
+    
     if args.all or args.webp:
-        generate_webp_tiles(quality=args.quality)
+        generate_webp_tiles(quality=args.quality, method=args.method)
+    
+    if args.avif:
+        generate_format_tiles("avif", quality=args.quality)
+    
+    if args.jxl:
+        generate_format_tiles("jxl", quality=args.quality)
     
     if args.all or args.preload:
         generate_preload_manifest()
     
-    if args.all or args.webp or args.preload:
+    if args.all or args.webp or args.avif or args.jxl or args.preload:
         generate_cache_headers()
         print("\n✓ Optimization complete!")
 
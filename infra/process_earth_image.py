@@ -18,13 +18,21 @@ Requirements:
 import re
 import sys
 from pathlib import Path
+from urllib.parse import urljoin
 
 try:
     import requests
+    from requests.adapters import HTTPAdapter
 except ImportError:
     print("Error: Required dependencies not installed. Please run: pip install requests")
     sys.exit(1)
 
+# Optional: parse page attributes with lxml (C parser) before regex-scanning
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
 # Local helpers from the generic tiler
 from process_real_image import (
     DOWNLOAD_DIR,
@@ -45,26 +53,44 @@ DIRECT_IMAGE_URL = (
 DEFAULT_FILENAME = "earth_suomi_original.jpg"
 DATASET_ID = "earth"
 
+# One pooled session so the URL probe's connection is reused for the download
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+
+_IMG_RE = re.compile(r"https?://[^\s\"']+\.(?:jpg|jpeg|png)", re.IGNORECASE)
+_DIM_RE = re.compile(r"(\d{3,5})")
+
 
-def resolve_direct_image_url(page_url: str) -> str:
+def resolve_direct_image_url(page_url: str, session: requests.Session = SESSION) -> str:
     """Attempt to find a direct image URL (jpg/jpeg/png) on the NASA page.
 
     Heuristics:
     - Fetch page HTML (with sensible timeout)
     - Find absolute URLs ending with common image extensions
+    - Add image URLs from src/href/og:image attributes (when lxml is available)
     - Prefer URLs containing 'orig'/'original' or largest-looking dimensions in name
     - Fallback to the first match
     """
-    resp = requests.get(page_url, timeout=30, allow_redirects=True)
+    resp = session.get(page_url, timeout=30, allow_redirects=True)
     resp.raise_for_status()
     html = resp.text
 
-    # Collect candidate image links
-    candidates = re.findall(r"https?://[^\s\"']+\.(?:jpg|jpeg|png)", html, re.IGNORECASE)
+    # Collect candidate image links; full-size URLs often live only in inline JSON
+    candidates = _IMG_RE.findall(html)
     if not candidates:
         # Some pages store asset JSON with escaped URLs; try unescaping then search again
         unescaped = html.encode("utf-8").decode("unicode_escape", errors="ignore")
-        candidates = re.findall(r"https?://[^\s\"']+\.(?:jpg|jpeg|png)", unescaped, re.IGNORECASE)
+        candidates = _IMG_RE.findall(unescaped)
+    if lxml is not None:
+        # Attributes add relative links the absolute-URL regex cannot see
+        doc = lxml.html.fromstring(resp.content)
+        attrs = doc.xpath(
+            '//*/@src | //*/@href | //meta[contains(@property, "image")]/@content'
+        )
+        candidates += [
+            url for url in (urljoin(resp.url, a.strip()) for a in attrs)
+            if _IMG_RE.fullmatch(url)
+        ]
 
     if not candidates:
         raise RuntimeError("Could not locate a direct image URL on the NASA page.")
@@ -73,7 +99,7 @@ def resolve_direct_image_url(page_url: str) -> str:
     def score(url: str) -> tuple:
         url_l = url.lower()
         s1 = 1 if ("orig" in url_l or "original" in url_l) else 0
-        nums = [int(n) for n in re.findall(r"(\d{3,5})", url_l)]
+        nums = [int(n) for n in _DIM_RE.findall(url_l)]
         s2 = max(nums) if nums else 0
         return (s1, s2)
 
@@ -81,18 +107,18 @@ def resolve_direct_image_url(page_url: str) -> str:
     return best
 
 
-def pick_image_url() -> str:
+def pick_image_url(session: requests.Session = SESSION) -> str:
     """Prefer the known direct URL; fall back to resolving from the page."""
     # Try the direct URL first
     try:
-        head = requests.head(DIRECT_IMAGE_URL, timeout=15, allow_redirects=True)
+        head = session.head(DIRECT_IMAGE_URL, timeout=15, allow_redirects=True)
         if head.ok and int(head.headers.get("content-length", "1")) > 0:
             return DIRECT_IMAGE_URL
     except Exception:
         pass
 
     # Fallback: resolve from page
-    return resolve_direct_image_url(NASA_PAGE_URL)
+    return resolve_direct_image_url(NASA_PAGE_URL, session)
 
 
 def main() -> None:
@@ -118,7 +144,7 @@ def main() -> None:
 
     # Download
     try:
-        download_image(image_url, image_path)
+        download_image(image_url, image_path, session=SESSION)
     except Exception as e:
         print(f"Error downloading image: {e}")
         print("You can manually download and place it at:")
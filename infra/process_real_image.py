@@ -7,29 +7,53 @@ Features:
 - Generates multi-resolution tile pyramid
 - Optimizes for web delivery (progressive JPEG, quality settings)
 - Creates proper DZI metadata
-- Supports resume of interrupted downloads
+- Parallel HTTP Range downloads (single-stream resume as fallback)
 """
 
+import contextlib
+import hashlib
+import io
 import math
+import multiprocessing
 import os
+import shutil
 import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
 from pathlib import Path
-from typing import Tuple
+from typing import Dict, List, Optional, Tuple
 import xml.etree.ElementTree as ET
 from xml.dom import minidom
 
 try:
+    import numpy as np
     import requests
+    from requests.adapters import HTTPAdapter
     from PIL import Image
     from tqdm import tqdm
 except ImportError:
     print("Error: Required dependencies not installed.")
-    print("Please run: pip install requests pillow tqdm")
+    print("Please run: pip install requests pillow numpy tqdm")
     sys.exit(1)
 
-# Disable PIL's decompression bomb protection for very large NASA images
-# The Andromeda image is 42208x9870 = 416M pixels which exceeds the default 178M limit
-Image.MAX_IMAGE_PIXELS = None
+# Optional: libvips streams the source in strips and tiles it in C (dzsave)
+try:
+    import pyvips
+except (ImportError, OSError):
+    pyvips = None
+
+# Optional: libjpeg-turbo encoder (SIMD DCT/Huffman); Pillow is the fallback
+try:
+    from turbojpeg import TJFLAG_PROGRESSIVE, TJPF_RGB, TJSAMP_420, TurboJPEG
+except ImportError:
+    TurboJPEG = None
+
+# Optional: xxh3 hashes tiles for deduplication faster than hashlib's blake2b
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
 
 
 # Configuration
@@ -43,10 +67,108 @@ TILE_OVERLAP = 1  # 1 pixel overlap for seamless rendering
 TILE_FORMAT = "jpg"
 TILE_QUALITY = 85  # JPEG quality (0-100)
 MAX_IMAGE_DIMENSION = 42208  # For memory safety, process in chunks if needed
+TILE_CHUNKSIZE = 64  # Tiles handed to a worker per round-trip
+DOWNLOAD_CONNECTIONS = 8  # Parallel HTTP Range requests per download
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # Bytes read per iter_content step
+MIN_PARALLEL_DOWNLOAD = 16 * 1024 * 1024  # Smaller files use a single stream
+PROGRESS_UPDATE_BYTES = 4 * 1024 * 1024  # Progress bar refresh granularity
+RANGE_TIMEOUT = (10, 60)  # (connect, read) seconds, so a stalled range cannot hang the pool
+DOWNSAMPLE_STRIP_ROWS = 1024  # Output rows per box-filter pass
+DEDUP_MAX_TILE_BYTES = 4096  # Only small (near-uniform) tiles are hashed for dedup
+
+# lifted_pixel_limit() suspends PIL's decompression-bomb limit for a block;
+# the count lets concurrent processors (ensure_datasets threads) share it
+_PIXEL_LIMIT_LOCK = threading.Lock()
+_PIXEL_LIMIT_USERS = 0
+_PIXEL_LIMIT_SAVED = None
+
+# One pyramid is built at a time per process: each build already uses every
+# core and holds a decoded source, so concurrent processors (ensure_datasets
+# threads) overlap their downloads but queue here for tiling
+_TILING_LOCK = threading.Lock()
+
+# Per-worker view of the level currently being tiled: (shm name, shm, array)
+_WORKER_LEVEL = None
+# Per-worker TurboJPEG handle; False once it is known to be unavailable
+_TURBOJPEG = None
+
+
+def _download_ranges(url: str, part_path: Path, total_size: int,
+                     connections: int = DOWNLOAD_CONNECTIONS,
+                     session: Optional[requests.Session] = None) -> None:
+    """
+    Download url into part_path with parallel HTTP Range requests.
+    
+    The file is preallocated and each range is written at its own offset
+    through a separate handle, so no reassembly step is needed. A caller's
+    session is reused (its pool should allow `connections` connections).
+    """
+    span = math.ceil(total_size / connections)
+    ranges = [(start, min(start + span, total_size) - 1) for start in range(0, total_size, span)]
+    
+    owns_session = session is None
+    if owns_session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=connections, pool_maxsize=connections)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+    
+    with open(part_path, 'wb') as f:
+        f.truncate(total_size)
+    
+    lock = threading.Lock()
+    
+    with tqdm(
+        total=total_size,
+        unit='B',
+        unit_scale=True,
+        unit_divisor=1024,
+        desc=f"Downloading ({len(ranges)} streams)"
+    ) as pbar:
+        def fetch(byte_range: Tuple[int, int]) -> None:
+            start, end = byte_range
+            response = session.get(url, headers={'Range': f'bytes={start}-{end}'}, stream=True,
+                                   timeout=RANGE_TIMEOUT)
+            response.raise_for_status()
+            if response.status_code != 206:
+                response.close()
+                raise RuntimeError("Server ignored the Range request")
+            
+            offset = start
+            pending = 0
+            with response, open(part_path, 'r+b') as f:
+                f.seek(start)
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    offset += len(chunk)
+                    pending += len(chunk)
+                    if pending >= PROGRESS_UPDATE_BYTES:
+                        with lock:
+                            pbar.update(pending)
+                        pending = 0
+            with lock:
+                pbar.update(pending)
+            
+            if offset != end + 1:
+                raise IOError(f"Incomplete range {start}-{end}: got {offset - start} bytes")
+        
+        try:
+            with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                list(executor.map(fetch, ranges))
+        finally:
+            if owns_session:
+                session.close()
 
 
-def download_image(url: str, output_path: Path, force: bool = False) -> Path:
-    """Download the NASA image with progress bar and resume support."""
+def download_image(url: str, output_path: Path, force: bool = False,
+                   session: Optional[requests.Session] = None) -> Path:
+    """
+    Download the NASA image with progress bar and resume support.
+    
+    Pass a session to reuse its pooled connections (e.g. the one a HEAD
+    probe already opened) instead of new TCP+TLS handshakes.
+    """
+    http = session or requests
     output_path.parent.mkdir(parents=True, exist_ok=True)
     
     if output_path.exists() and not force:
@@ -56,8 +178,22 @@ def download_image(url: str, output_path: Path, force: bool = False) -> Path:
     print(f"Downloading image ({url})...")
     
     # Get file size
-    response = requests.head(url, allow_redirects=True)
+    response = http.head(url, allow_redirects=True)
     total_size = int(response.headers.get('content-length', 0))
+    accepts_ranges = response.headers.get('accept-ranges', '').lower() == 'bytes'
+    
+    if accepts_ranges and total_size >= MIN_PARALLEL_DOWNLOAD and not output_path.exists():
+        part_path = output_path.with_name(output_path.name + ".part")
+        try:
+            _download_ranges(url, part_path, total_size, session=session)
+        except (requests.RequestException, OSError, RuntimeError) as e:
+            # Advertised range support is not always honoured; one stream still works
+            print(f"Parallel download failed ({e}); retrying with a single stream...")
+            part_path.unlink(missing_ok=True)
+        else:
+            part_path.replace(output_path)
+            print(f"✓ Download complete: {output_path}")
+            return output_path
     
     # Check if we have a partial download
     resume_header = {}
@@ -69,7 +205,7 @@ def download_image(url: str, output_path: Path, force: bool = False) -> Path:
             print(f"Resuming download from {initial_pos / 1024 / 1024:.1f}MB...")
     
     # Download with progress bar
-    response = requests.get(url, headers=resume_header, stream=True)
+    response = http.get(url, headers=resume_header, stream=True)
     response.raise_for_status()
     
     mode = 'ab' if initial_pos > 0 else 'wb'
@@ -82,18 +218,64 @@ def download_image(url: str, output_path: Path, force: bool = False) -> Path:
             unit_divisor=1024,
             desc="Downloading"
         ) as pbar:
-            for chunk in response.iter_content(chunk_size=8192):
+            pending = 0
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
                 if chunk:
                     f.write(chunk)
-                    pbar.update(len(chunk))
+                    pending += len(chunk)
+                    if pending >= PROGRESS_UPDATE_BYTES:
+                        pbar.update(pending)
+                        pending = 0
+            pbar.update(pending)
     
     print(f"✓ Download complete: {output_path}")
     return output_path
 
 
+@contextlib.contextmanager
+def lifted_pixel_limit():
+    """
+    Disable Image.MAX_IMAGE_PIXELS for the block, restoring it afterwards.
+    
+    Yields the limit that was in force. PIL checks it in Image.open and in
+    crop(), so only those calls on trusted sources need to run in here.
+    """
+    global _PIXEL_LIMIT_USERS, _PIXEL_LIMIT_SAVED
+    with _PIXEL_LIMIT_LOCK:
+        if _PIXEL_LIMIT_USERS == 0:
+            _PIXEL_LIMIT_SAVED = Image.MAX_IMAGE_PIXELS
+            Image.MAX_IMAGE_PIXELS = None
+        _PIXEL_LIMIT_USERS += 1
+        saved = _PIXEL_LIMIT_SAVED
+    try:
+        yield saved
+    finally:
+        with _PIXEL_LIMIT_LOCK:
+            _PIXEL_LIMIT_USERS -= 1
+            if _PIXEL_LIMIT_USERS == 0:
+                Image.MAX_IMAGE_PIXELS = _PIXEL_LIMIT_SAVED
+
+
+def open_source_image(image_path: Path) -> Image.Image:
+    """
+    Open a trusted source image that may exceed PIL's pixel limit.
+    
+    The Andromeda image is 42208x9870 = 416M pixels, well over the default
+    178M limit. The limit is lifted for this call alone rather than globally
+    for every importer of this module, with a warning when it mattered.
+    """
+    with lifted_pixel_limit() as limit:
+        img = Image.open(image_path)
+    width, height = img.size
+    if limit is not None and width * height > limit:
+        print(f"Warning: {image_path} has {width * height:,} pixels, over PIL's "
+              f"{limit:,}-pixel decompression-bomb limit; opening it anyway")
+    return img
+
+
 def get_image_info(image_path: Path) -> Tuple[int, int]:
     """Get image dimensions without loading entire image into memory."""
-    with Image.open(image_path) as img:
+    with open_source_image(image_path) as img:
         return img.size
 
 
@@ -124,8 +306,262 @@ def create_dzi_xml(width: int, height: int, tile_size: int, overlap: int, format
     return dom.toprettyxml(indent='  ')
 
 
+def tile_boxes(width: int, height: int, tile_size: int, overlap: int) -> np.ndarray:
+    """
+    Return an int32 [N, 6] table of (x1, y1, x2, y2, col, row) for a level.
+    
+    Boxes include the overlap and are clamped to the image; rows are
+    ordered column-major (all rows of column 0 first).
+    """
+    cols = math.ceil(width / tile_size)
+    rows = math.ceil(height / tile_size)
+    col_idx, row_idx = np.meshgrid(
+        np.arange(cols, dtype=np.int32), np.arange(rows, dtype=np.int32), indexing="ij"
+    )
+    col_idx = col_idx.ravel()
+    row_idx = row_idx.ravel()
+    x = col_idx * tile_size
+    y = row_idx * tile_size
+    
+    return np.stack([
+        np.maximum(0, x - overlap),
+        np.maximum(0, y - overlap),
+        np.minimum(width, x + tile_size + overlap),
+        np.minimum(height, y + tile_size + overlap),
+        col_idx,
+        row_idx,
+    ], axis=1).astype(np.int32)
+
+
+def _create_level_buffer(width: int, height: int) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    """Allocate a shared-memory RGB level image and a NumPy view onto it."""
+    shm = shared_memory.SharedMemory(create=True, size=width * height * 3)
+    return shm, np.ndarray((height, width, 3), dtype=np.uint8, buffer=shm.buf)
+
+
+def downsample_2x(src: np.ndarray, out: np.ndarray) -> None:
+    """
+    Write the 2x2 box average of src into out.
+    
+    out must be (ceil(src_h / 2), ceil(src_w / 2)), the DZI level size; an
+    odd trailing row/column of src is averaged with a copy of itself.
+    Works in row strips so the uint16 accumulator stays small, and never
+    copies or pads src as a whole.
+    """
+    out_h, out_w = out.shape[:2]
+    pairs_h = src.shape[0] // 2  # Output rows/columns with two source rows/columns
+    pairs_w = src.shape[1] // 2
+    
+    for y0 in range(0, pairs_h, DOWNSAMPLE_STRIP_ROWS):
+        y1 = min(pairs_h, y0 + DOWNSAMPLE_STRIP_ROWS)
+        block = src[2 * y0:2 * y1]
+        acc = block[0::2, 0:2 * pairs_w:2].astype(np.uint16)
+        acc += block[1::2, 0:2 * pairs_w:2]
+        acc += block[0::2, 1:2 * pairs_w:2]
+        acc += block[1::2, 1:2 * pairs_w:2]
+        acc += 2
+        acc >>= 2
+        out[y0:y1, :pairs_w] = acc
+        if pairs_w < out_w:
+            out[y0:y1, -1] = _edge_average(block[0::2, -1], block[1::2, -1])
+    
+    if pairs_h < out_h:
+        row = src[-1]
+        out[-1, :pairs_w] = _edge_average(row[0:2 * pairs_w:2], row[1:2 * pairs_w:2])
+        if pairs_w < out_w:
+            out[-1, -1] = row[-1]
+
+
+def _edge_average(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """2x2 box average of a 2x1 edge whose missing half replicates it."""
+    acc = a.astype(np.uint16)
+    acc += b
+    acc <<= 1
+    acc += 2
+    acc >>= 2
+    return acc
+
+
+def copy_image_rows(img: Image.Image, out: np.ndarray) -> None:
+    """
+    Copy an RGB image's pixels into out in row strips.
+    
+    np.asarray(img) would materialize a second full-size raster before the
+    copy; going strip by strip keeps the transient to one strip.
+    """
+    width, height = img.size
+    for y0 in range(0, height, DOWNSAMPLE_STRIP_ROWS):
+        y1 = min(height, y0 + DOWNSAMPLE_STRIP_ROWS)
+        out[y0:y1] = np.asarray(img.crop((0, y0, width, y1)))
+
+
+def _attach_level(shm_name: str, width: int, height: int) -> np.ndarray:
+    """Map the shared-memory level image into this worker (once per level)."""
+    global _WORKER_LEVEL
+    if _WORKER_LEVEL is not None and _WORKER_LEVEL[0] == shm_name:
+        return _WORKER_LEVEL[2]
+
+    if _WORKER_LEVEL is not None:
+        _, old_shm, old_level = _WORKER_LEVEL
+        _WORKER_LEVEL = None
+        del old_level  # release the buffer export before closing
+        old_shm.close()
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    level = np.ndarray((height, width, 3), dtype=np.uint8, buffer=shm.buf)
+    _WORKER_LEVEL = (shm_name, shm, level)
+    return level
+
+
+def _get_turbojpeg():
+    """Return this worker's TurboJPEG encoder, or None if libjpeg-turbo is missing."""
+    global _TURBOJPEG
+    if _TURBOJPEG is None:
+        _TURBOJPEG = False
+        if TurboJPEG is not None:
+            try:
+                _TURBOJPEG = TurboJPEG()
+            except (OSError, RuntimeError):
+                pass  # Python binding installed but the shared library is not
+    return _TURBOJPEG or None
+
+
+def _tile_digest(data: bytes) -> str:
+    """Content hash used to spot byte-identical tiles."""
+    if xxhash is not None:
+        return xxhash.xxh3_128_hexdigest(data)
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _encode_tile(level: np.ndarray, box: Tuple[int, int, int, int], tile_path: str,
+                 quality: int) -> bytes:
+    """Crop one tile out of a level image, save it and return the encoded bytes."""
+    x1, y1, x2, y2 = box
+    pixels = level[y1:y2, x1:x2]
+
+    # Save as progressive JPEG for better web performance
+    turbo = _get_turbojpeg()
+    if turbo is not None:
+        data = turbo.encode(
+            np.ascontiguousarray(pixels),
+            quality=quality,
+            pixel_format=TJPF_RGB,
+            jpeg_subsample=TJSAMP_420,
+            flags=TJFLAG_PROGRESSIVE,
+        )
+    else:
+        buf = io.BytesIO()
+        Image.fromarray(pixels).save(
+            buf,
+            format='JPEG',
+            quality=quality,
+            optimize=True,
+            progressive=True
+        )
+        data = buf.getvalue()
+
+    Path(tile_path).write_bytes(data)
+    return data
+
+
+def _encode_tiles(task: tuple) -> Tuple[int, List[Tuple[str, str]]]:
+    """
+    Worker: encode a chunk of rows from the tile_boxes table.
+    
+    Returns the tile count and (path, digest) for each small tile, so the
+    parent can hardlink byte-identical ones.
+    """
+    shm_name, width, height, boxes, level_dir, quality = task
+    level = _attach_level(shm_name, width, height)
+    digests = []
+    for x1, y1, x2, y2, col, row in boxes.tolist():
+        tile_path = os.path.join(level_dir, f"{col}_{row}.{TILE_FORMAT}")
+        data = _encode_tile(level, (x1, y1, x2, y2), tile_path, quality)
+        if len(data) <= DEDUP_MAX_TILE_BYTES:
+            digests.append((tile_path, _tile_digest(data)))
+    return len(boxes), digests
+
+
+def link_duplicate_tiles(digests: List[Tuple[str, str]], seen: Dict[str, str]) -> int:
+    """
+    Replace tiles whose content was already written with hardlinks to the
+    first copy; seen maps digest -> first path and is updated in place.
+    
+    Black sky produces many identical tiles. If the filesystem refuses the
+    link (no hardlink support, cross-device), the tile keeps its own copy.
+    Returns the number of tiles linked.
+    """
+    linked = 0
+    for tile_path, digest in digests:
+        first = seen.setdefault(digest, tile_path)
+        if first == tile_path:
+            continue
+        tmp_path = tile_path + ".link"
+        try:
+            os.link(first, tmp_path)
+            os.replace(tmp_path, tile_path)
+        except OSError:
+            if os.path.lexists(tmp_path):
+                os.unlink(tmp_path)
+            continue
+        linked += 1
+    return linked
+
+
+def _reset_output_dir(output_dir: Path) -> None:
+    """Clear existing tiles and recreate the dataset directory."""
+    if output_dir.exists():
+        print("Removing old tiles...")
+        shutil.rmtree(output_dir)
+    
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+
+def generate_tiles_vips(image_path: Path, output_dir: Path, tile_size: int = TILE_SIZE,
+                        overlap: int = TILE_OVERLAP, quality: int = TILE_QUALITY):
+    """
+    Generate the tile pyramid with libvips dzsave.
+    
+    The source is streamed (access="sequential"), so peak memory stays in
+    the tens of MB regardless of image size. dzsave writes the pyramid down
+    to a single tile plus info.dzi; levels are moved out of info_files/ and
+    renumbered from 0 into the same {level}/{col}_{row}.jpg layout that
+    generate_tiles_optimized writes and the API serves.
+    """
+    print(f"\nProcessing image with libvips: {image_path}")
+    
+    image = pyvips.Image.new_from_file(str(image_path), access="sequential")
+    print(f"Image dimensions: {image.width} x {image.height}")
+    
+    _reset_output_dir(output_dir)
+    
+    image.dzsave(
+        str(output_dir / "info"),
+        layout="dz",
+        depth="onetile",
+        tile_size=tile_size,
+        overlap=overlap,
+        suffix=f".{TILE_FORMAT}[Q={quality},optimize_coding,interlace,strip]",
+    )
+    print(f"✓ Created DZI metadata: {output_dir / 'info.dzi'}")
+    
+    files_dir = output_dir / "info_files"
+    level_dirs = [d for d in files_dir.iterdir() if d.is_dir() and d.name.isdigit()]
+    # dzsave keeps standard DZI numbering (level 0 is 1x1) even with depth=onetile
+    min_level = min(int(d.name) for d in level_dirs)
+    total_tiles = 0
+    for level_dir in level_dirs:
+        total_tiles += sum(1 for _ in level_dir.iterdir())
+        level_dir.rename(output_dir / str(int(level_dir.name) - min_level))
+    shutil.rmtree(files_dir)
+    
+    print(f"\n✓ Total tiles generated: {total_tiles}")
+    print(f"✓ Tiles saved to: {output_dir}")
+
+
 def generate_tiles_optimized(image_path: Path, output_dir: Path, tile_size: int = TILE_SIZE, 
-                             overlap: int = TILE_OVERLAP, quality: int = TILE_QUALITY):
+                             overlap: int = TILE_OVERLAP, quality: int = TILE_QUALITY,
+                             workers: Optional[int] = None):
     """
     Generate optimized tile pyramid from source image.
     
@@ -134,11 +570,32 @@ def generate_tiles_optimized(image_path: Path, output_dir: Path, tile_size: int
     - Optimal quality settings
     - Memory-efficient processing
     - Only generates necessary levels
+    - Tiles encoded in parallel; each level is shared with the worker
+      processes through shared memory instead of being pickled
+    
+    Uses libvips (generate_tiles_vips) when pyvips is installed. Calls from
+    different threads run one after another.
     """
+    with _TILING_LOCK:
+        if pyvips is not None:
+            return generate_tiles_vips(image_path, output_dir, tile_size, overlap, quality)
+        return _generate_tiles_pillow(image_path, output_dir, tile_size, overlap, quality,
+                                      workers)
+
+
+def _tile_pool_context():
+    """Start tile workers without fork(): callers may have download threads running."""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _generate_tiles_pillow(image_path: Path, output_dir: Path, tile_size: int, overlap: int,
+                           quality: int, workers: Optional[int]):
+    """Pillow/NumPy pyramid for generate_tiles_optimized."""
     print(f"\nProcessing image: {image_path}")
     
     # Get image dimensions
-    with Image.open(image_path) as img:
+    with open_source_image(image_path) as img:
         original_width, original_height = img.size
         print(f"Image dimensions: {original_width} x {original_height}")
         
@@ -146,13 +603,7 @@ def generate_tiles_optimized(image_path: Path, output_dir: Path, tile_size: int
         num_levels = calculate_pyramid_levels(original_width, original_height, tile_size)
         print(f"Generating {num_levels} zoom levels...")
         
-        # Clear existing tiles
-        if output_dir.exists():
-            import shutil
-            print("Removing old tiles...")
-            shutil.rmtree(output_dir)
-        
-        output_dir.mkdir(parents=True, exist_ok=True)
+        _reset_output_dir(output_dir)
         
         # Generate DZI metadata
         dzi_xml = create_dzi_xml(original_width, original_height, tile_size, overlap, TILE_FORMAT)
@@ -162,67 +613,81 @@ def generate_tiles_optimized(image_path: Path, output_dir: Path, tile_size: int
         print(f"✓ Created DZI metadata: {dzi_path}")
         
         # Generate pyramid levels from highest to lowest resolution
-        current_img = img.copy()
-        current_width, current_height = original_width, original_height
+        # The top level uses the source pixels as-is, so no copy is needed
+        current_img = img if img.mode == "RGB" else img.convert("RGB")
         
         total_tiles = 0
+        linked_tiles = 0
+        seen_tiles: Dict[str, str] = {}
+        level_shm, level_arr = None, None
+        next_shm, next_arr = None, None
         
-        for level in range(num_levels - 1, -1, -1):
-            level_dir = output_dir / str(level)
-            level_dir.mkdir(exist_ok=True)
-            
-            # Calculate dimensions for this level
-            scale = 2 ** (num_levels - 1 - level)
-            level_width = max(1, original_width // scale)
-            level_height = max(1, original_height // scale)
-            
-            # Resize image for this level if needed
-            if level < num_levels - 1:
-                current_img = current_img.resize(
-                    (level_width, level_height),
-                    Image.Resampling.LANCZOS
-                )
-            
-            # Calculate number of tiles for this level
-            cols = math.ceil(level_width / tile_size)
-            rows = math.ceil(level_height / tile_size)
-            
-            print(f"Level {level}: {level_width}x{level_height} ({cols}x{rows} tiles)")
-            
-            # Generate tiles for this level
-            for col in range(cols):
-                for row in range(rows):
-                    # Calculate tile boundaries
-                    x = col * tile_size
-                    y = row * tile_size
+        try:
+            with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                     mp_context=_tile_pool_context()) as executor:
+                for level in range(num_levels - 1, -1, -1):
+                    level_dir = output_dir / str(level)
+                    level_dir.mkdir(exist_ok=True)
                     
-                    # Add overlap
-                    x1 = max(0, x - overlap)
-                    y1 = max(0, y - overlap)
-                    x2 = min(level_width, x + tile_size + overlap)
-                    y2 = min(level_height, y + tile_size + overlap)
+                    # Calculate dimensions for this level. DZI viewers size levels
+                    # with ceil(); flooring here could drop a 1px edge column/row
+                    # of tiles that the viewer then requests anyway.
+                    scale = 2 ** (num_levels - 1 - level)
+                    level_width = math.ceil(original_width / scale)
+                    level_height = math.ceil(original_height / scale)
                     
-                    # Extract tile
-                    tile = current_img.crop((x1, y1, x2, y2))
+                    # Each level is a 2x box downsample of the previous one
+                    next_shm, next_arr = _create_level_buffer(level_width, level_height)
+                    if level_arr is None:
+                        with lifted_pixel_limit():
+                            copy_image_rows(current_img, next_arr)
+                        # The crops decoded the whole source; free it (and any
+                        # RGB conversion) before the lower levels are built
+                        current_img.close()
+                        img.close()
+                        current_img = None
+                    else:
+                        downsample_2x(level_arr, next_arr)
+                        level_arr = None
+                        level_shm.close()
+                        level_shm.unlink()
+                    level_shm, level_arr = next_shm, next_arr
                     
-                    # Save as progressive JPEG for better web performance
-                    tile_path = level_dir / f"{col}_{row}.{TILE_FORMAT}"
-                    tile.save(
-                        tile_path,
-                        format='JPEG',
-                        quality=quality,
-                        optimize=True,
-                        progressive=True
-                    )
-                    total_tiles += 1
-            
-            print(f"  ✓ Generated {cols * rows} tiles")
+                    # Calculate number of tiles for this level
+                    cols = math.ceil(level_width / tile_size)
+                    rows = math.ceil(level_height / tile_size)
+                    
+                    print(f"Level {level}: {level_width}x{level_height} ({cols}x{rows} tiles)")
+                    
+                    boxes = tile_boxes(level_width, level_height, tile_size, overlap)
+                    tasks = [
+                        (level_shm.name, level_width, level_height,
+                         boxes[i:i + TILE_CHUNKSIZE], str(level_dir), quality)
+                        for i in range(0, len(boxes), TILE_CHUNKSIZE)
+                    ]
+                    
+                    for count, digests in executor.map(_encode_tiles, tasks):
+                        total_tiles += count
+                        linked_tiles += link_duplicate_tiles(digests, seen_tiles)
+                    
+                    print(f"  ✓ Generated {cols * rows} tiles")
+        finally:
+            level_arr = next_arr = None
+            # A failure while filling a level leaves next_shm not yet promoted
+            if next_shm is not None and next_shm is not level_shm:
+                next_shm.close()
+                next_shm.unlink()
+            if level_shm is not None:
+                level_shm.close()
+                level_shm.unlink()
         
         print(f"\n✓ Total tiles generated: {total_tiles}")
+        if linked_tiles:
+            print(f"✓ Hardlinked {linked_tiles} duplicate tiles")
         print(f"✓ Tiles saved to: {output_dir}")
 
 
-def main():
+def main(argv: Optional[List[str]] = None):
     """Main processing pipeline."""
     print("=" * 60)
     print("NASA Deep Zoom Tile Generator")
@@ -235,7 +700,7 @@ def main():
     image_url = os.environ.get("IMAGE_URL")
     output_filename = os.environ.get("OUTPUT_FILENAME")
 
-    args = sys.argv[1:]
+    args = sys.argv[1:] if argv is None else argv
     if len(args) >= 1:
         dataset_id = args[0]
     if len(args) >= 2:
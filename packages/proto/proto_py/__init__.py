@@ -4,15 +4,18 @@ Used by FastAPI services for request/response validation.
 """
 
 from datetime import datetime
-from typing import Any, Dict, List, Literal, Optional, Tuple, Union
+from typing import Annotated, Any, Dict, List, Literal, Optional, Tuple, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Discriminator, Field, Tag
 
 
 class Point(BaseModel):
     x: float
     y: float
 
+    class Config:
+        frozen = True
+
 
 class BBox(BaseModel):
     x: float
@@ -20,10 +23,41 @@ class BBox(BaseModel):
     width: float
     height: float
 
+    class Config:
+        frozen = True
+
 
 class Polygon(BaseModel):
     points: List[Point]
 
+    class Config:
+        frozen = True
+
+
+def _geometry_tag(value: Any) -> Optional[str]:
+    """Pick the geometry model from its keys; the wire format has no type field."""
+    if isinstance(value, (Point, BBox, Polygon)):
+        return type(value).__name__.lower()
+    if not isinstance(value, dict):
+        return None
+    if "points" in value:
+        return "polygon"
+    if "width" in value or "height" in value:
+        return "bbox"
+    return "point"
+
+
+# Dispatches straight to one model instead of trying each union member in
+# turn, which also stops a bbox from validating as its x/y Point prefix
+Geometry = Annotated[
+    Union[
+        Annotated[Point, Tag("point")],
+        Annotated[BBox, Tag("bbox")],
+        Annotated[Polygon, Tag("polygon")],
+    ],
+    Discriminator(_geometry_tag),
+]
+
 
 class Dataset(BaseModel):
     id: str
@@ -55,7 +89,7 @@ class Feature(BaseModel):
     datasetId: str
     name: str
     type: Literal["point", "bbox", "polygon"]
-    geometry: Union[Point, BBox, Polygon]
+    geometry: Geometry
     properties: Optional[Dict[str, Any]] = None
     createdAt: Optional[datetime] = None
 
@@ -65,7 +99,7 @@ class Annotation(BaseModel):
     datasetId: str
     userId: Optional[str] = None
     type: Literal["point", "rect", "polygon"]
-    geometry: Union[Point, BBox, Polygon]
+    geometry: Geometry
     label: Optional[str] = None
     description: Optional[str] = None
     color: Optional[str] = None
@@ -77,7 +111,7 @@ class Annotation(BaseModel):
 class CreateAnnotation(BaseModel):
     datasetId: str
     type: Literal["point", "rect", "polygon"]
-    geometry: Union[Point, BBox, Polygon]
+    geometry: Geometry
     label: Optional[str] = None
     description: Optional[str] = None
     color: Optional[str] = "#ff0000"
@@ -85,7 +119,7 @@ class CreateAnnotation(BaseModel):
 
 
 class UpdateAnnotation(BaseModel):
-    geometry: Optional[Union[Point, BBox, Polygon]] = None
+    geometry: Optional[Geometry] = None
     label: Optional[str] = None
     description: Optional[str] = None
     color: Optional[str] = None